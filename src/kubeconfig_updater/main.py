@@ -1,9 +1,12 @@
 #!/usr/bin/env python3
+import atexit
 import os
 import re
 import shutil
 import subprocess
-from typing import Dict, Optional
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
 
 import yaml
 from rich.console import Console
@@ -13,9 +16,48 @@ from rich.prompt import Prompt
 from rich.theme import Theme
 from rich.traceback import install
 
-from kubeconfig_updater.schema import ClusterConfig, KubeConfig, UserConfig, UserEntry
+from kubeconfig_updater.schema import (
+    ClusterConfig,
+    ContextRec,
+    KubeConfig,
+    UserConfig,
+)
 
-install(show_locals=True)
+install(show_locals=False)
+
+# Prefer the libyaml-backed loader/dumper, falling back to the pure-Python ones
+Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+Dumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+ADMIN_CONF_PATH = "/etc/kubernetes/admin.conf"
+
+# Let ssh itself give up quickly on unreachable or stalled hosts
+SSH_OPTS = [
+    "-o",
+    "ConnectTimeout=3",
+    "-o",
+    "ServerAliveInterval=2",
+    "-o",
+    "ServerAliveCountMax=1",
+]
+
+# Hard ceiling for a non-interactive ssh call
+SSH_TIMEOUT = 10
+# Looser ceiling when the user may have to answer ssh prompts; still bounds
+# a host that accepts TCP and then stalls during authentication
+SSH_INTERACTIVE_TIMEOUT = 120
+# ssh reserves this exit status for its own errors (connection, auth, ...)
+SSH_ERROR = 255
+
+# Remote fetches are network-bound, so a small thread pool is plenty
+MAX_WORKERS = 8
+
+_HOSTNAME_RE = re.compile(r"https?://([^:]+)(?::\d+)?")
+# kubeadm writes these as single-line, unquoted base64 values
+_CLIENT_CERT_RE = re.compile(
+    rb"^\s*client-certificate-data:\s*([A-Za-z0-9+/=]+)\s*$", re.M
+)
+_CLIENT_KEY_RE = re.compile(rb"^\s*client-key-data:\s*([A-Za-z0-9+/=]+)\s*$", re.M)
 
 # Initialize rich console with custom theme
 console = Console(
@@ -26,10 +68,8 @@ console = Console(
 
 
 def parse_hostname(server_url: str) -> Optional[str]:
-    m = re.match(r"https?://([^:]+)(:\d+)?", server_url)
-    if m:
-        return m.group(1)
-    return None
+    m = _HOSTNAME_RE.match(server_url)
+    return m.group(1) if m else None
 
 
 def get_server_username(cluster_info: ClusterConfig, host: str) -> str:
@@ -43,12 +83,60 @@ def get_server_username(cluster_info: ClusterConfig, host: str) -> str:
     return username
 
 
+def ssh_command(
+    host: str, username: str, control_dir: Optional[str] = None, batch: bool = False
+) -> List[str]:
+    """Build the ssh argv prefix, multiplexing over a shared master if possible."""
+    cmd = ["ssh", *SSH_OPTS]
+    if batch:
+        # Fail with SSH_ERROR instead of prompting on the terminal
+        cmd += ["-o", "BatchMode=yes"]
+    if control_dir:
+        cmd += [
+            "-o",
+            "ControlMaster=auto",
+            "-o",
+            f"ControlPath={control_dir}/%C",
+            "-o",
+            # Masters must outlive unbounded prompts earlier in the run;
+            # close_ssh_masters stops them explicitly at exit
+            "ControlPersist=yes",
+        ]
+    return cmd + [f"{username}@{host}"]
+
+
+def close_ssh_masters(control_dir: str, masters: Set[Tuple[str, str]]) -> None:
+    """Stop every ControlMaster opened during this run and remove its sockets."""
+    for host, username in masters:
+        try:
+            subprocess.run(
+                ssh_command(host, username, control_dir) + ["-O", "exit"],
+                capture_output=True,
+                timeout=5,
+                check=False,
+            )
+        except subprocess.TimeoutExpired:
+            # Leave a wedged master behind rather than hang at exit
+            pass
+    shutil.rmtree(control_dir, ignore_errors=True)
+
+
 def ssh_fetch_admin_conf(
     host: str,
     username: str,
     env: Optional[Dict[str, str]] = None,
     status: Optional[Progress] = None,
-) -> Optional[str]:
+    control_dir: Optional[str] = None,
+    sudo_password: Optional[str] = None,
+    batch: bool = False,
+    timeout: float = SSH_TIMEOUT,
+) -> Optional[subprocess.CompletedProcess]:
+    """Read admin.conf from host once; None if ssh could not be run to completion.
+
+    The caller inspects the exit status: 0 is success, SSH_ERROR means ssh
+    itself failed (e.g. it needs to prompt under batch mode), and anything
+    else means the remote read failed, typically for lack of sudo.
+    """
     try:
         # Use the passed status object instead of creating a new one
         status_message = f"Reading admin.conf from {host} as {username}..."
@@ -57,74 +145,66 @@ def ssh_fetch_admin_conf(
         else:
             console.print(status_message)
 
-        # First try reading directly without sudo
-        result = subprocess.run(
-            ["ssh", f"{username}@{host}", "cat /etc/kubernetes/admin.conf"],
+        # The password goes to sudo on stdin, never onto the command line
+        if sudo_password is None:
+            remote_cmd = f"cat {ADMIN_CONF_PATH}"
+            sudo_input = None
+        else:
+            remote_cmd = f"sudo -S -p '' cat {ADMIN_CONF_PATH}"
+            sudo_input = (sudo_password + "\n").encode()
+
+        # Raw bytes on stdout; the YAML loader decodes them itself
+        return subprocess.run(
+            ssh_command(host, username, control_dir, batch) + [remote_cmd],
+            input=sudo_input,
             capture_output=True,
-            text=True,
-            timeout=5,
+            timeout=timeout,
             env=env,
         )
 
-        # If direct read succeeds
-        if result.returncode == 0:
-            return result.stdout
-
-        # If sudo privileges are required
-        if status:
-            console.print(
-                f"Sudo privileges required to read admin.conf from [cyan]{host}[/cyan]"
-            )
-            sudo_password = Prompt.ask(
-                f"Enter sudo password for {username}@{host}", password=True
-            )
-        else:
-            console.print(
-                f"Sudo privileges required to read admin.conf from [cyan]{host}[/cyan]"
-            )
-            sudo_password = Prompt.ask(
-                f"Enter sudo password for {username}@{host}", password=True
-            )
+    except Exception as e:
+        console.print(f"[error]Error connecting to {host}: {str(e)}[/error]")
+        return None
 
-        # Create script content that will be embedded in the command
-        askpass_script = f"""#!/bin/sh
-echo '{sudo_password}'
-"""
-
-        # Combine all commands into a single SSH session
-        sudo_cmd = (
-            # Create temporary directory with cleanup trap
-            "XDIR=$(mktemp -d /tmp/askpass_XXXXXX); "
-            'trap "rm -rf $XDIR" EXIT; '
-            # Create askpass script
-            f'echo "{askpass_script}" > "$XDIR/askpass.sh"; '
-            'chmod 700 "$XDIR/askpass.sh"; '
-            # Use the askpass script to read admin.conf
-            'export SUDO_ASKPASS="$XDIR/askpass.sh"; '
-            "sudo -A cat /etc/kubernetes/admin.conf"
-        )
 
-        result = subprocess.run(
-            ["ssh", f"{username}@{host}", sudo_cmd],
-            capture_output=True,
-            text=True,
-            timeout=30,
-            env=env,
-        )
+def _extract_admin_fields(data: bytes) -> Optional[Tuple[str, str]]:
+    """Pull the client certificate and key out of admin.conf without parsing it."""
+    cert = _CLIENT_CERT_RE.search(data)
+    key = _CLIENT_KEY_RE.search(data)
+    if cert and key:
+        return cert.group(1).decode("ascii"), key.group(1).decode("ascii")
+    return None
 
-        if result.returncode != 0:
-            console.print(
-                f"[error]Unable to read /etc/kubernetes/admin.conf from {host}[/error]"
-            )
-            console.print(f"[error]Error output: {result.stderr}[/error]")
-            return None
 
-        return result.stdout
+def parse_admin_conf(host: str, admin_conf_data: bytes) -> Optional[Tuple[str, str]]:
+    """Return the client certificate and key from an admin.conf read from host."""
+    if fields := _extract_admin_fields(admin_conf_data):
+        return fields
 
+    # Fall back to a full parse for anything that is not kubeadm-shaped
+    try:
+        remote_conf = yaml.load(admin_conf_data, Loader=Loader)
     except Exception as e:
-        console.print(f"[error]Error connecting to {host}: {str(e)}[/error]")
+        console.print(f"[error]Error parsing admin.conf from {host}: {e}[/error]")
         return None
 
+    if not (remote_users := remote_conf.get("users", [])):
+        console.print(
+            f"[warning]No user data in admin.conf from remote {host}, skipping[/warning]"
+        )
+        return None
+
+    remote_user = remote_users[0].get("user") or {}
+    remote_cert = remote_user.get("client-certificate-data")
+    remote_key = remote_user.get("client-key-data")
+    if not (remote_cert and remote_key):
+        console.print(
+            f"[warning]No client certificate data found in admin.conf from remote {host}, skipping[/warning]"
+        )
+        return None
+
+    return remote_cert, remote_key
+
 
 def backup_file(filepath: str) -> None:
     backup_path = filepath + ".bak"
@@ -132,6 +212,26 @@ def backup_file(filepath: str) -> None:
     console.print(f"[info]Backup created at {backup_path}[/info]")
 
 
+def write_kubeconfig(filepath: str, config: KubeConfig) -> None:
+    """Write config next to filepath and atomically swap it into place."""
+    # Write through symlinks (e.g. dotfile managers) instead of replacing them
+    real_path = os.path.realpath(filepath)
+    # mkstemp creates the file 0600, so key material is never world-readable
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(real_path), prefix=".config.")
+    try:
+        with os.fdopen(fd, "w") as f:
+            yaml.dump(
+                config, f, Dumper=Dumper, sort_keys=False, default_flow_style=False
+            )
+        # Keep the original permissions; kubeconfigs are usually 0600
+        shutil.copymode(real_path, tmp_path)
+        os.replace(tmp_path, real_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
 def main() -> None:
     console.print(
         Panel.fit(
@@ -143,8 +243,8 @@ def main() -> None:
     kubeconfig_path = os.path.expanduser("~/.kube/config")
     # Read local kubeconfig
     try:
-        with open(kubeconfig_path, "r") as f:
-            local_config: KubeConfig = yaml.safe_load(f)
+        with open(kubeconfig_path, "rb") as f:
+            local_config: KubeConfig = yaml.load(f, Loader=Loader)
     except Exception as e:
         console.print(f"[error]Error reading {kubeconfig_path}: {str(e)}[/error]")
         return
@@ -158,34 +258,48 @@ def main() -> None:
     users: Dict[str, UserConfig] = {
         item["name"]: item["user"] for item in local_config.get("users", [])
     }
-    contexts = local_config.get("contexts", [])
+    cluster_servers: Dict[str, Optional[str]] = {
+        name: cluster.get("server") for name, cluster in clusters.items() if cluster
+    }
+    # Contexts are only read, so convert them once to slotted records
+    contexts = [ContextRec.from_entry(ctx) for ctx in local_config.get("contexts", [])]
 
     # Track update status
-    updated_contexts = []
+    updated_contexts: List[str] = []
+
+    # Share one SSH connection per (host, username) across all contexts; keep
+    # the directory short, since socket paths are limited to ~104 bytes and
+    # macOS $TMPDIR alone takes half of that. %C is a fixed-length hash.
+    control_dir = tempfile.mkdtemp(prefix="kcu-", dir="/tmp")
+    ssh_masters: Set[Tuple[str, str]] = set()
+    atexit.register(close_ssh_masters, control_dir, ssh_masters)
 
     console.print(f"[info]Total contexts to process: {len(contexts)}")
 
+    # Resolve hosts and usernames up front so that prompts stay on the main
+    # thread and the remote fetches below are pure I/O
+    jobs: List[Tuple[str, str, str, str]] = []
+    host_usernames: Dict[str, str] = {}
     for idx, ctx in enumerate(contexts, start=1):
-        context_name = ctx.get("name")
-        ctx_details = ctx.get("context", {})
-        cluster_name = ctx_details.get("cluster")
-        user_name = ctx_details.get("user")
+        context_name = ctx.name
+        cluster_name = ctx.cluster
+        user_name = ctx.user
 
         console.print(f"[info]Processing context {idx}/{len(contexts)}: {context_name}")
 
-        if not (cluster_name and user_name):
+        if not (context_name and cluster_name and user_name):
             console.print(
-                f"[warning]Skipping context {context_name} due to missing cluster/user data[/warning]"
+                f"[warning]Skipping context {context_name} due to missing name/cluster/user data[/warning]"
             )
             continue
 
-        if not (cluster_info := clusters.get(cluster_name)):
+        if cluster_name not in cluster_servers:
             console.print(
                 f"[warning]Cannot find cluster {cluster_name} configuration, skipping context {context_name}[/warning]"
             )
             continue
 
-        if not (server_url := cluster_info.get("server")):
+        if not (server_url := cluster_servers[cluster_name]):
             console.print(
                 f"[warning]Cluster {cluster_name} missing server field, skipping context {context_name}[/warning]"
             )
@@ -197,44 +311,111 @@ def main() -> None:
             )
             continue
 
-        # Get username for this server
-        username = get_server_username(cluster_info, host)
-        cluster_info["serveruser"] = username
-
-        # Set LC_ALL=C to avoid locale issues
-        env = os.environ.copy()
-        env["LC_ALL"] = "C"
-
-        # Fetch admin.conf from the remote server
-        if not (admin_conf_text := ssh_fetch_admin_conf(host, username, env)):
-            continue
-
-        try:
-            remote_conf = yaml.safe_load(admin_conf_text)
-        except Exception as e:
-            console.print(f"[error]Error parsing admin.conf from {host}: {e}[/error]")
-            continue
-
-        if not (remote_users := remote_conf.get("users", [])):
+        if not users.get(user_name):
             console.print(
-                f"[warning]No user data in admin.conf from remote {host}, skipping[/warning]"
+                f"[warning]Cannot find user {user_name} in local kubeconfig, skipping[/warning]"
             )
             continue
 
-        remote_user = remote_users[0]
-        remote_cert = remote_user.get("user", {}).get("client-certificate-data")
-        remote_key = remote_user.get("user", {}).get("client-key-data")
-        if not (remote_cert and remote_key):
+        # Get username for this server, asking at most once per host
+        cluster_info = clusters[cluster_name]
+        if "serveruser" not in cluster_info and host in host_usernames:
+            cluster_info["serveruser"] = host_usernames[host]
+        username = get_server_username(cluster_info, host)
+        cluster_info["serveruser"] = username
+        host_usernames.setdefault(host, username)
+
+        jobs.append((context_name, user_name, host, username))
+
+    # Clusters on one host may log in as different users, so each
+    # (host, username) pair is its own SSH target
+    targets = list(dict.fromkeys((host, username) for _, _, host, username in jobs))
+    ssh_masters.update(targets)
+
+    # Set LC_ALL=C to avoid locale issues
+    ssh_env = {**os.environ, "LC_ALL": "C"}
+
+    # Contexts sharing a target share one admin.conf; fetch each target only
+    # once and remember failures too so they are not retried
+    admin_conf_data: Dict[Tuple[str, str], bytes] = {}
+    sudo_passwords: Dict[Tuple[str, str], str] = {}
+
+    def read_target(
+        target: Tuple[str, str],
+    ) -> Optional[subprocess.CompletedProcess]:
+        host, username = target
+        return ssh_fetch_admin_conf(
+            host,
+            username,
+            ssh_env,
+            control_dir=control_dir,
+            sudo_password=sudo_passwords.get(target),
+            batch=True,
+        )
+
+    def report_failure(host: str, result: subprocess.CompletedProcess) -> None:
+        stderr = result.stderr.decode(errors="replace")
+        if result.returncode == SSH_ERROR:
+            console.print(f"[error]Error connecting to {host}: {stderr}[/error]")
+        else:
             console.print(
-                f"[warning]No client certificate data found in admin.conf from remote {host}, skipping[/warning]"
+                f"[error]Unable to read {ADMIN_CONF_PATH} from {host}[/error]"
             )
-            continue
-
-        if not (local_user := users.get(user_name)):
+            console.print(f"[error]Error output: {stderr}[/error]")
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        # First pass: a plain read per target, concurrently. Batch mode makes
+        # ssh fail instead of prompting, so workers never touch the terminal
+        first_results = list(executor.map(read_target, targets))
+
+        # Targets that need a host key, password or passphrase are retried
+        # interactively one at a time, and sudo passwords are asked for here
+        for (host, username), result in zip(targets, first_results):
+            if result is not None and result.returncode == SSH_ERROR:
+                result = ssh_fetch_admin_conf(
+                    host,
+                    username,
+                    ssh_env,
+                    control_dir=control_dir,
+                    timeout=SSH_INTERACTIVE_TIMEOUT,
+                )
+            if result is None:
+                continue
+            if result.returncode == 0:
+                admin_conf_data[host, username] = result.stdout
+                continue
+            if result.returncode == SSH_ERROR:
+                report_failure(host, result)
+                continue
             console.print(
-                f"[warning]Cannot find user {user_name} in local kubeconfig, skipping[/warning]"
+                f"Sudo privileges required to read admin.conf from [cyan]{host}[/cyan]"
+            )
+            sudo_passwords[host, username] = Prompt.ask(
+                f"Enter sudo password for {username}@{host}", password=True
             )
+
+        # Second pass, only for sudo targets, over the already-open masters
+        sudo_targets = list(sudo_passwords)
+        for (host, username), result in zip(
+            sudo_targets, executor.map(read_target, sudo_targets)
+        ):
+            if result is None:
+                continue
+            if result.returncode == 0:
+                admin_conf_data[host, username] = result.stdout
+            else:
+                report_failure(host, result)
+
+    admin_conf_cache: Dict[Tuple[str, str], Optional[Tuple[str, str]]] = {
+        (host, username): parse_admin_conf(host, data)
+        for (host, username), data in admin_conf_data.items()
+    }
+
+    for context_name, user_name, host, username in jobs:
+        if not (credentials := admin_conf_cache.get((host, username))):
             continue
+        remote_cert, remote_key = credentials
+        local_user = users[user_name]
 
         changed = False
         if local_user.get("client-certificate-data") != remote_cert:
@@ -248,23 +429,20 @@ def main() -> None:
             local_user["client-key-data"] = remote_key
             changed = True
 
+        # local_user is the same dict referenced from local_config["users"],
+        # so the update above is already reflected in what gets written
         if changed:
             updated_contexts.append(context_name)
-            local_config["users"] = [
-                UserEntry(name=name, user=user_data)
-                for name, user_data in users.items()
-            ]
 
     try:
         if updated_contexts:
-            with open(kubeconfig_path, "w") as f:
-                yaml.safe_dump(local_config, f, sort_keys=False)
+            write_kubeconfig(kubeconfig_path, local_config)
             console.print("[success]Updated ~/.kube/config[/success]")
             console.print(
                 "[success] Credentials updated for the following contexts:[/success]"
             )
-            for ctx in updated_contexts:
-                console.print(f"[success] - {ctx}[/success]")
+            for context_name in updated_contexts:
+                console.print(f"[success] - {context_name}[/success]")
         else:
             console.print("[info]All credentials are up-to-date[/info]")
     except Exception as e:
@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from typing import List, Optional, TypedDict
 
 
@@ -43,3 +44,21 @@ class KubeConfig(TypedDict):
     kind: str
     preferences: dict
     users: List[UserEntry]
+
+
+@dataclass(slots=True, frozen=True)
+class ContextRec:
+    """Flattened, read-only view of a context entry used by the update loop."""
+
+    name: Optional[str]
+    cluster: Optional[str]
+    user: Optional[str]
+
+    @classmethod
+    def from_entry(cls, entry: Context) -> "ContextRec":
+        details = entry.get("context") or {}
+        return cls(
+            name=entry.get("name"),
+            cluster=details.get("cluster"),
+            user=details.get("user"),
+        )